@@ -13,12 +13,27 @@ Note: This uses Instagram's internal API which may change. Use responsibly.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import logging
+import orjson
+import sys
+import threading
 import time
-from typing import List, Dict, Set, Optional
+from typing import List, Set, Optional
 from urllib.parse import urlparse, parse_qs
 import re
 
+logger = logging.getLogger(__name__)
+
+
+# One "name=value" pair of a Cookie header string; name and value are stripped by the caller
+_COOKIE_RE = re.compile(r'([^;=]*)=([^;]*)')
+
+# Responses that signal server pressure; the page is retried after backing off
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
 
 class InstagramAPIScraper:
     def __init__(self, user_id: str, csrf_token: str, **kwargs):
@@ -34,6 +49,16 @@ class InstagramAPIScraper:
         self.csrf_token = csrf_token
         self.session = requests.Session()
         
+        # Keep-alive pool sized for the concurrent followers/following fetches;
+        # connection-level failures are retried here, HTTP status handling
+        # (429/5xx backoff) stays in _fetch_users
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=3, backoff_factor=0.5),
+        )
+        self.session.mount('https://', adapter)
+        
         # Set up headers based on the Instagram API format
         self.headers = {
             'accept': '*/*',
@@ -67,44 +92,95 @@ class InstagramAPIScraper:
         if kwargs.get('cookies'):
             self._set_cookies_from_string(kwargs['cookies'])
         
-        # Rate limiting
+        # Rate limiting: request_delay adapts between the min and max bounds,
+        # shrinking while Instagram responds normally and doubling under pressure
         self.request_delay = 2  # seconds between requests
+        self.min_request_delay = 0.5
+        self.max_request_delay = 60
+        self.max_retries = 5  # retries per page when rate limited or failing
+        
+        # followers and following may be fetched from two threads at once; they share
+        # request_delay and one schedule of request slots so the account's combined
+        # request rate stays at one request per request_delay
+        self._pacing_lock = threading.Lock()
+        self._next_request_at = 0.0  # time.monotonic() of the next free request slot
+    
+    def _wait_for_request_slot(self):
+        """Reserve the next request slot and sleep until it starts."""
+        with self._pacing_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at)
+            self._next_request_at = slot + self.request_delay
+        if slot > now:
+            time.sleep(slot - now)
+    
+    def _back_off(self, response: requests.Response) -> float:
+        """Double request_delay after a throttled/failed page and hold off all requests; returns the wait."""
+        with self._pacing_lock:
+            self.request_delay = min(self.max_request_delay, self.request_delay * 2)
+            wait_time = self._get_retry_after(response)
+            if wait_time is None:
+                wait_time = self.request_delay
+            self._next_request_at = max(self._next_request_at, time.monotonic() + wait_time)
+        return wait_time
+    
+    def _ease_off(self):
+        """Shrink request_delay back towards the minimum after a healthy page."""
+        with self._pacing_lock:
+            self.request_delay = max(self.min_request_delay, self.request_delay * 0.9)
     
     def _set_cookies_from_string(self, cookie_string: str):
         """Parse cookie string and set cookies in the session."""
         try:
-            # Parse the cookie string
-            cookies = {}
-            for cookie in cookie_string.split(';'):
-                cookie = cookie.strip()
-                if '=' in cookie:
-                    name, value = cookie.split('=', 1)
-                    cookies[name.strip()] = value.strip()
+            # Parse the cookie string in a single regex scan
+            cookies = {match.group(1).strip(): match.group(2).strip() for match in _COOKIE_RE.finditer(cookie_string)}
             
             # Set cookies in the session
             self.session.cookies.update(cookies)
-            print(f"Set {len(cookies)} cookies in session")
+            logger.info(f"Set {len(cookies)} cookies in session")
             
         except Exception as e:
-            print(f"Warning: Could not parse cookies: {e}")
+            logger.warning(f"Could not parse cookies: {e}")
     
-    def _fetch_users(self, endpoint: str, max_count: Optional[int] = None) -> List[Dict]:
+    def _get_retry_after(self, response: requests.Response) -> Optional[float]:
+        """Return the Retry-After delay in seconds, capped at max_request_delay, if the server sent one."""
+        retry_after = response.headers.get('retry-after')
+        if not retry_after:
+            return None
+        try:
+            # Never stall the job thread longer than our own backoff ceiling
+            return min(self.max_request_delay, max(0.0, float(retry_after)))
+        except ValueError:
+            return None
+    
+    def _fetch_users(self, endpoint: str, max_count: Optional[int] = None) -> List[str]:
         """
         Common method to fetch users (followers or following).
         
+        Only the username of each user is kept; the rest of the user object
+        is discarded as soon as the page has been parsed.
+        
         Args:
             endpoint: The API endpoint ('followers' or 'following')
             max_count: Maximum number of users to fetch (None for all)
             
         Returns:
-            List of user dictionaries
+            List of usernames
+            
+        Raises:
+            requests.exceptions.HTTPError: If a page still fails after max_retries retries
+            requests.exceptions.RequestException: If a page cannot be fetched
+            json.JSONDecodeError: If a page is not valid JSON
+            ValueError: If a page has no user list
         """
         user_type = endpoint  # Use endpoint as user_type for display purposes
-        print(f"Fetching {user_type} for user ID: {self.user_id}")
+        logger.info(f"Fetching {user_type} for user ID: {self.user_id}")
         
         users = []
         max_id = None
         batch_count = 0
+        retries = 0
+        exhausted_response = None
         
         while True:
             # Build URL
@@ -117,53 +193,77 @@ class InstagramAPIScraper:
             try:
                 batch_count += 1
                 current_count = len(users)
-                print(f"Fetching batch {batch_count}... (current count: {current_count})")
+                logger.debug(f"Fetching {user_type} batch {batch_count}... (current count: {current_count})")
                 
+                # Rate limiting: the round trip and parsing count towards the delay
+                self._wait_for_request_slot()
                 response = self.session.get(url, params=params)
+                
+                # Back off and retry the same page when rate limited or the server is struggling
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    retries += 1
+                    wait_time = self._back_off(response)
+                    if retries > self.max_retries:
+                        logger.error(f"{user_type}: still getting HTTP {response.status_code} after {self.max_retries} retries, giving up")
+                        exhausted_response = response
+                        break
+                    logger.warning(f"{user_type}: got HTTP {response.status_code}, retrying in {wait_time:.1f}s")
+                    batch_count -= 1
+                    continue
+                
                 response.raise_for_status()
+                retries = 0
                 
-                data = response.json()
+                data = orjson.loads(response.content)
                 
                 # Extract users from response
                 if 'users' in data:
-                    batch_users = data['users']
+                    # Interned so followers/following share one object per username
+                    batch_users = [sys.intern(user['username']) for user in data['users'] if 'username' in user]
+                    skipped = len(data['users']) - len(batch_users)
+                    if skipped:
+                        logger.warning(f"{user_type}: skipped {skipped} entries without a username")
                     users.extend(batch_users)
-                    print(f"  Fetched {len(batch_users)} users in this batch")
+                    logger.debug(f"{user_type}: fetched {len(batch_users)} users in this batch")
                 else:
-                    print(f"  No users found in response: {data}")
-                    break
+                    raise ValueError(f"no users found in response: {data}")
                 
                 # Check if we've reached the limit
                 if max_count and len(users) >= max_count:
                     users = users[:max_count]
-                    print(f"  Reached maximum count: {max_count}")
+                    logger.debug(f"{user_type}: reached maximum count: {max_count}")
                     break
                 
                 # Check if there are more pages
                 if 'next_max_id' in data and data['next_max_id']:
                     max_id = data['next_max_id']
-                    print(f"  Next max_id: {max_id[:20]}...")
+                    logger.debug(f"{user_type}: next max_id: {max_id[:20]}...")
                 else:
-                    print("  No more pages available")
+                    logger.debug(f"{user_type}: no more pages available")
                     break
                 
-                # Rate limiting
-                time.sleep(self.request_delay)
+                # Healthy page: ease the delay back towards the minimum
+                self._ease_off()
                 
+            # Re-raised so the job fails rather than reporting a truncated list
             except requests.exceptions.RequestException as e:
-                print(f"  Error fetching batch: {e}")
-                break
+                logger.error(f"{user_type}: error fetching batch: {e}")
+                raise
             except json.JSONDecodeError as e:
-                print(f"  Error parsing JSON response: {e}")
-                break
+                logger.error(f"{user_type}: error parsing JSON response: {e}")
+                raise
             except Exception as e:
-                print(f"  Unexpected error: {e}")
-                break
+                logger.error(f"{user_type}: unexpected error: {e}")
+                raise
+        
+        # A truncated list would be reported as a successful analysis, so fail instead
+        if exhausted_response is not None:
+            exhausted_response.raise_for_status()
         
-        print(f"Total {user_type} fetched: {len(users)}")
+        logger.info(f"Total {user_type} fetched: {len(users)}")
         return users
     
-    def get_followers(self, max_count: Optional[int] = None) -> List[Dict]:
+    def get_followers(self, max_count: Optional[int] = None) -> List[str]:
         """
         Fetch all followers of the user.
         
@@ -171,11 +271,11 @@ class InstagramAPIScraper:
             max_count: Maximum number of followers to fetch (None for all)
             
         Returns:
-            List of follower dictionaries
+            List of follower usernames
         """
         return self._fetch_users('followers', max_count)
     
-    def get_following(self, max_count: Optional[int] = None) -> List[Dict]:
+    def get_following(self, max_count: Optional[int] = None) -> List[str]:
         """
         Fetch all users that the user is following.
         
@@ -183,17 +283,6 @@ class InstagramAPIScraper:
             max_count: Maximum number of following to fetch (None for all)
             
         Returns:
-            List of following dictionaries
+            List of following usernames
         """
-        return self._fetch_users('following', max_count)
-    
-    def extract_usernames(self, users: List[Dict]) -> List[str]:
-        """Extract usernames from user dictionaries."""
-        usernames = []
-        for user in users:
-            if 'username' in user:
-                usernames.append(user['username'])
-            else:
-                print(f"Warning: No username found in user data: {user}")
-        
-        return usernames
\ No newline at end of file
+        return self._fetch_users('following', max_count)
\ No newline at end of file
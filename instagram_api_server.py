@@ -13,45 +13,97 @@ Endpoints:
     POST /api/analyze - Submit new analysis job (requires only target_user_id)
     POST /api/analyze-not-following-back - Submit new not-following-back analysis job
     GET /api/status/<job_id> - Get job status
+    GET /api/status?ids=<id1>,<id2> - Get the status of several jobs at once
+    GET /api/status/<job_id>/stream - Stream job status as Server-Sent Events
     GET /api/queue - Get queue status
     GET /api/health - Health check
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import orjson
 import uuid
 import time
 import threading
+import heapq
+from collections import OrderedDict, deque
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from concurrent.futures import ThreadPoolExecutor
-import json
 from datetime import datetime
 import sys
 import os
+import re
 import logging
 
 # Import our existing Instagram scraper
 from instagram_api_scraper import InstagramAPIScraper
+from json_provider import OrjsonProvider
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Configuration
 MAX_CONCURRENT_JOBS = 5
 JOB_CLEANUP_DELAY = 1800  # 30 minutes in seconds
+MAX_STATUS_BATCH = 100  # Max job_ids per batch status request
+MAX_JOBS_IN_MEMORY = 10000  # Oldest finished jobs are evicted beyond this
+MAX_QUEUED_JOBS = 1000  # New submissions are rejected beyond this
+STATUS_STREAM_HEARTBEAT = 15  # Seconds between keep-alive comments on status streams
+USER_ID_RE = re.compile(r'[0-9]{1,20}')  # ASCII digits only; Instagram IDs fit in 64 bits
+BOT_MANAGER_CACHE_TTLS = {  # Seconds to reuse bot manager responses for /api/queue and /api/health
+    '/api/queue/status': 1.0,
+    '/api/bot/health': 5.0,
+}
 BOT_SLAVE_MANAGER_URL = "http://localhost:5001"  # Bot slave manager URL
 
 # Global state management
+# state_lock guards active_sessions, job_status and job_queue, which are shared
+# between Flask request threads, executor workers and cleanup timers
+state_lock = threading.RLock()
 active_sessions = set()  # Track which user_ids are currently being processed
-job_status = {}  # Track job statuses
-job_queue = []  # Queue for jobs waiting to start
+job_status = OrderedDict()  # Track job statuses; finished jobs move to the end
+job_queue = deque()  # Queue for jobs waiting to start
+user_active_job = {}  # target_user_id -> job_id of its queued/processing job
+cleanup_heap = []  # (expires_at, job_id) min-heap of finished jobs awaiting cleanup
+cleanup_condition = threading.Condition()
+status_changed = threading.Condition(state_lock)  # Wakes status streams; status_version bumps on each change
+status_version = 0
 executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS)
 
+# One keep-alive connection pool for every call to the bot manager. Each running job
+# holds a status stream open, so size the pool well above MAX_CONCURRENT_JOBS.
+bot_manager_session = requests.Session()
+_bot_manager_adapter = HTTPAdapter(
+    pool_connections=MAX_CONCURRENT_JOBS,
+    pool_maxsize=MAX_CONCURRENT_JOBS * 4,
+    max_retries=Retry(total=3, backoff_factor=0.2)
+)
+bot_manager_session.mount('http://', _bot_manager_adapter)
+bot_manager_session.mount('https://', _bot_manager_adapter)
+JSON_HEADERS = {'Content-Type': 'application/json'}  # Bodies are pre-encoded with orjson
+bot_manager_cache = {}  # path -> (expires_at, response or the RequestException it raised)
+bot_manager_cache_locks = {path: threading.Lock() for path in BOT_MANAGER_CACHE_TTLS}
+
+def notify_status_change():
+    """Wake status stream subscribers after job_status or job_queue changed. Caller must hold state_lock."""
+    global status_version
+    status_version += 1
+    status_changed.notify_all()
+
+def publish_status(job_id, changes):
+    """Apply changes to a job's status and push them to its status stream subscribers"""
+    with state_lock:
+        job_status[job_id].update(changes)
+        notify_status_change()
+
 def generate_job_id():
-    """Generate a random UUID for the job ID"""
-    return str(uuid.uuid4())
+    """Generate a random UUID for the job ID (32 hex chars, no dashes)"""
+    return uuid.uuid4().hex
 
 # Removed unused InstagramBotAnalyzerAPI class - all analysis is delegated to bot manager
 
@@ -66,16 +118,17 @@ def submit_job_to_bot_manager(job_data: dict) -> dict:
         dict: Job submission result with job_id and queue position
     """
     try:
-        response = requests.post(f"{BOT_SLAVE_MANAGER_URL}/api/job/submit", 
-                               json=job_data, timeout=10)
+        response = bot_manager_session.post(f"{BOT_SLAVE_MANAGER_URL}/api/job/submit", 
+                                            data=orjson.dumps(job_data), headers=JSON_HEADERS,
+                                            timeout=10)
         
         if response.status_code == 200:
-            return response.json()
+            return orjson.loads(response.content)
         else:
             logger.error(f"Failed to submit job: {response.status_code}")
             return None
             
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         logger.error(f"Error submitting job: {e}")
         return None
 
@@ -90,18 +143,75 @@ def get_job_status_from_bot_manager(job_id: str) -> dict:
         dict: Job status information
     """
     try:
-        response = requests.get(f"{BOT_SLAVE_MANAGER_URL}/api/job/status/{job_id}", timeout=10)
+        response = bot_manager_session.get(f"{BOT_SLAVE_MANAGER_URL}/api/job/status/{job_id}", timeout=10)
         
         if response.status_code == 200:
-            return response.json()
+            return orjson.loads(response.content)
         else:
             logger.error(f"Failed to get job status: {response.status_code}")
             return None
             
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         logger.error(f"Error getting job status: {e}")
         return None
 
+def get_bot_manager_cached(path: str) -> requests.Response:
+    """
+    GET a bot manager endpoint, sharing one upstream call among all requests
+    within its BOT_MANAGER_CACHE_TTLS window. Failures are cached and re-raised too.
+    
+    Args:
+        path: Endpoint path, one of BOT_MANAGER_CACHE_TTLS
+    """
+    with bot_manager_cache_locks[path]:
+        cached = bot_manager_cache.get(path)
+        if cached is None or cached[0] <= time.monotonic():
+            try:
+                outcome = bot_manager_session.get(f"{BOT_SLAVE_MANAGER_URL}{path}", timeout=5)
+            except requests.exceptions.RequestException as e:
+                outcome = e
+            cached = (time.monotonic() + BOT_MANAGER_CACHE_TTLS[path], outcome)
+            bot_manager_cache[path] = cached
+    
+    if isinstance(cached[1], Exception):
+        raise cached[1]
+    return cached[1]
+
+def watch_job_status_from_bot_manager(job_id: str, max_wait_time: float):
+    """
+    Yield job status updates from the bot manager until max_wait_time has elapsed.
+    
+    Updates are pushed over the bot manager's Server-Sent Events stream. If the
+    stream cannot be opened or drops, falls back to polling every 2 seconds.
+    
+    Args:
+        job_id: Job identifier
+        max_wait_time: Seconds to keep watching before giving up
+    """
+    deadline = time.time() + max_wait_time
+    
+    try:
+        # The read timeout only has to outlast the bot manager's 15s keep-alive comments
+        with bot_manager_session.get(
+            f"{BOT_SLAVE_MANAGER_URL}/api/job/status/{job_id}/subscribe",
+            stream=True,
+            timeout=(5, 60)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if time.time() >= deadline:
+                    return
+                if line.startswith('data:'):
+                    yield orjson.loads(line[5:])
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning(f"[{job_id}] Status stream unavailable, falling back to polling: {e}")
+    
+    while time.time() < deadline:
+        bot_status = get_job_status_from_bot_manager(job_id)
+        if bot_status:
+            yield bot_status
+        time.sleep(2)  # Wait 2 seconds before checking again
+
 def complete_job_in_bot_manager(job_id: str):
     """
     Mark a job as completed in the bot manager.
@@ -110,8 +220,9 @@ def complete_job_in_bot_manager(job_id: str):
         job_id: Job identifier
     """
     try:
-        response = requests.post(f"{BOT_SLAVE_MANAGER_URL}/api/job/complete", 
-                               json={'job_id': job_id}, timeout=10)
+        response = bot_manager_session.post(f"{BOT_SLAVE_MANAGER_URL}/api/job/complete", 
+                                            data=orjson.dumps({'job_id': job_id}), headers=JSON_HEADERS,
+                                            timeout=10)
         
         if response.status_code != 200:
             logger.error(f"Failed to complete job: {response.status_code}")
@@ -141,14 +252,11 @@ def process_job(job_data: dict) -> None:
         # The bot manager will handle bot assignment and processing internally
         logger.info(f"[{job_id}] Job submitted to bot manager queue")
         
-        # Poll bot manager for job status and completion
+        # Follow job status in the bot manager until completion
         max_wait_time = 300  # 5 minutes max wait
-        wait_start = time.time()
         processing_started = False
         
-        while time.time() - wait_start < max_wait_time:
-            # Check job status in bot manager
-            bot_status = get_job_status_from_bot_manager(job_id)
+        for bot_status in watch_job_status_from_bot_manager(job_id, max_wait_time):
             logger.info(f"[{job_id}] Bot manager status: {bot_status}")
             
             if bot_status:
@@ -156,14 +264,18 @@ def process_job(job_data: dict) -> None:
                 
                 # Update local status based on bot manager status
                 if bot_status_type == 'queued':
-                    job_status[job_id]['status'] = 'queued'
-                    job_status[job_id]['position_in_queue'] = bot_status.get('position_in_queue', 0)
-                    job_status[job_id]['estimated_wait_time'] = bot_status.get('estimated_wait_time', 0)
+                    publish_status(job_id, {
+                        'status': 'queued',
+                        'position_in_queue': bot_status.get('position_in_queue', 0),
+                        'estimated_wait_time': bot_status.get('estimated_wait_time', 0)
+                    })
                 elif bot_status_type == 'processing' and not processing_started:
                     # Job just started processing
-                    job_status[job_id]['status'] = 'processing'
-                    job_status[job_id]['started_at'] = time.time()
-                    job_status[job_id]['assigned_bot'] = bot_status.get('assigned_bot')
+                    publish_status(job_id, {
+                        'status': 'processing',
+                        'started_at': time.time(),
+                        'assigned_bot': bot_status.get('assigned_bot')
+                    })
                     processing_started = True
                     logger.info(f"[{job_id}] Job started processing by bot {bot_status.get('assigned_bot')}")
                 elif bot_status_type in ['completed', 'failed']:
@@ -175,78 +287,126 @@ def process_job(job_data: dict) -> None:
                         logger.error(f"[{job_id}] Job failed in bot manager: {error_msg}")
                         raise ValueError(f"Bot manager error: {error_msg}")
                     break
-            
-            time.sleep(2)  # Wait 2 seconds before checking again
         else:
             raise ValueError("Job did not complete within timeout period")
         
         # Update with results
-        job_status[job_id].update({
-            'status': 'completed',
-            'result': result,
-            'completed_at': time.time()
-        })
+        with state_lock:
+            publish_status(job_id, {
+                'status': 'completed',
+                'result': result,
+                'completed_at': time.time()
+            })
+            job_status.move_to_end(job_id)
         
         logger.info(f"[{job_id}] Job completed successfully")
         
     except ValueError as e:
         error_msg = f"Validation error: {str(e)}"
         logger.error(f"[{job_id}] {error_msg}")
-        job_status[job_id].update({
-            'status': 'failed',
-            'error': error_msg,
-            'failed_at': time.time()
-        })
+        with state_lock:
+            publish_status(job_id, {
+                'status': 'failed',
+                'error': error_msg,
+                'failed_at': time.time()
+            })
+            job_status.move_to_end(job_id)
         
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}"
         logger.error(f"[{job_id}] {error_msg}")
-        job_status[job_id].update({
-            'status': 'failed',
-            'error': error_msg,
-            'failed_at': time.time()
-        })
+        with state_lock:
+            publish_status(job_id, {
+                'status': 'failed',
+                'error': error_msg,
+                'failed_at': time.time()
+            })
+            job_status.move_to_end(job_id)
     
     finally:
         # Mark job as completed in bot manager
         complete_job_in_bot_manager(job_id)
         
         # Remove from active sessions
-        active_sessions.discard(target_user_id)
+        with state_lock:
+            active_sessions.discard(target_user_id)
+            if user_active_job.get(target_user_id) == job_id:
+                del user_active_job[target_user_id]
         
         # Clean up completed job after a delay
-        threading.Timer(JOB_CLEANUP_DELAY, cleanup_completed_job, args=[job_id]).start()
+        schedule_job_cleanup(job_id)
         
         # Process next job in queue if any
         process_next_queued_job()
 
 def cleanup_completed_job(job_id):
     """Remove completed job from job_status to allow new submissions"""
-    if job_id in job_status:
-        status = job_status[job_id]['status']
-        if status in ['completed', 'failed']:
-            del job_status[job_id]
-            logger.info(f"Cleaned up {status} job: {job_id}")
+    with state_lock:
+        if job_id in job_status:
+            status = job_status[job_id]['status']
+            if status in ['completed', 'failed']:
+                del job_status[job_id]
+                logger.info(f"Cleaned up {status} job: {job_id}")
+
+def evict_finished_jobs():
+    """Evict the longest-finished jobs so a new job fits under MAX_JOBS_IN_MEMORY. Caller must hold state_lock."""
+    excess = len(job_status) - MAX_JOBS_IN_MEMORY + 1
+    if excess <= 0:
+        return
+    
+    finished_job_ids = [job_id for job_id, status in job_status.items()
+                        if status['status'] in ['completed', 'failed']]
+    evicted_job_ids = finished_job_ids[:excess]
+    for job_id in evicted_job_ids:
+        del job_status[job_id]
+    
+    if evicted_job_ids:
+        logger.info(f"Evicted {len(evicted_job_ids)} finished jobs from memory")
+
+def schedule_job_cleanup(job_id):
+    """Schedule a finished job for removal after JOB_CLEANUP_DELAY"""
+    with cleanup_condition:
+        heapq.heappush(cleanup_heap, (time.monotonic() + JOB_CLEANUP_DELAY, job_id))
+        cleanup_condition.notify()
+
+def cleanup_worker():
+    """Single janitor thread that removes finished jobs as their cleanup delay expires"""
+    while True:
+        with cleanup_condition:
+            while not cleanup_heap or cleanup_heap[0][0] > time.monotonic():
+                timeout = cleanup_heap[0][0] - time.monotonic() if cleanup_heap else None
+                cleanup_condition.wait(timeout)
+            _, job_id = heapq.heappop(cleanup_heap)
+        
+        try:
+            cleanup_completed_job(job_id)
+        except Exception as e:
+            logger.error(f"Error cleaning up job {job_id}: {e}")
+
+threading.Thread(target=cleanup_worker, daemon=True).start()
 
 def process_next_queued_job():
     """Process the next job in queue if we have capacity"""
-    if len(active_sessions) < MAX_CONCURRENT_JOBS and job_queue:
-        # Find next job that doesn't conflict with active sessions
-        for i, job_data in enumerate(job_queue):
-            if job_data['target_user_id'] not in active_sessions:
-                # Remove from queue and start processing
-                job_data = job_queue.pop(i)
-                active_sessions.add(job_data['target_user_id'])
-                
-                # Submit to thread pool
-                executor.submit(process_job, job_data)
-                break
+    with state_lock:
+        if len(active_sessions) < MAX_CONCURRENT_JOBS and job_queue:
+            # Find next job that doesn't conflict with active sessions;
+            # this is almost always the head, which deque removes in O(1)
+            for i, job_data in enumerate(job_queue):
+                if job_data['target_user_id'] not in active_sessions:
+                    # Remove from queue and start processing
+                    del job_queue[i]
+                    active_sessions.add(job_data['target_user_id'])
+                    notify_status_change()
+                    
+                    # Submit to thread pool
+                    executor.submit(process_job, job_data)
+                    break
 
 def find_active_job_for_user(target_user_id):
     """Find active job (processing or queued) for this user"""
-    for job_id, status in job_status.items():
-        if (status.get('target_user_id') == target_user_id and 
-            status.get('status') in ['processing', 'queued']):
+    with state_lock:
+        job_id = user_active_job.get(target_user_id)
+        if job_id in job_status and job_status[job_id].get('status') in ['processing', 'queued']:
             return job_id
     return None
 
@@ -261,6 +421,142 @@ def estimate_wait_time(queue_length):
     
     return f"{min_time}-{max_time} minutes"
 
+def get_queue_positions():
+    """Map each locally queued job_id to its 1-based position. Caller must hold state_lock."""
+    return {job_data['job_id']: position for position, job_data in enumerate(job_queue, 1)}
+
+def build_status_response(job_id, queue_positions):
+    """Build the client-facing status of a job. Caller must hold state_lock."""
+    status = job_status[job_id].copy()
+    
+    # Update queue position if still queued
+    if status['status'] == 'queued' and job_id in queue_positions:
+        status['position_in_queue'] = queue_positions[job_id]
+    
+    # Add timing information
+    if 'started_at' in status:
+        status['processing_time'] = time.time() - status['started_at']
+    
+    return status
+
+def generate_status_events(job_id):
+    """Yield Server-Sent Events frames for a job until it completes, fails or is cleaned up"""
+    last_key = None
+    while True:
+        with state_lock:
+            seen_version = status_version
+            if job_id in job_status:
+                queue_positions = get_queue_positions() if job_status[job_id]['status'] == 'queued' else {}
+                status = build_status_response(job_id, queue_positions)
+            else:
+                status = {'job_id': job_id, 'error': 'Job not found'}
+        
+        # processing_time ticks on every read, so only status and position count as a change
+        key = (status.get('status'), status.get('position_in_queue'))
+        if key != last_key:
+            last_key = key
+            yield f"data: {orjson.dumps(status, option=orjson.OPT_NON_STR_KEYS).decode()}\n\n"
+        
+        if status.get('status') in (None, 'completed', 'failed'):
+            return
+        
+        with status_changed:
+            changed = status_changed.wait_for(lambda: status_version != seen_version,
+                                              timeout=STATUS_STREAM_HEARTBEAT)
+        if not changed:
+            yield ": keepalive\n\n"
+
+def validate_analysis_request(data):
+    """Return an error response if the request has no valid target_user_id, otherwise None"""
+    if not data:
+        return jsonify({'error': 'No JSON data provided'}), 400
+    
+    if 'target_user_id' not in data:
+        return jsonify({'error': 'target_user_id is required'}), 400
+    
+    # Validate target_user_id is numeric
+    target_user_id = data['target_user_id']
+    if not isinstance(target_user_id, str) or not USER_ID_RE.fullmatch(target_user_id):
+        return jsonify({'error': 'target_user_id must be numeric'}), 400
+    
+    return None
+
+def submit_analysis_job(job_type, target_user_id, extra_job_data=None):
+    """
+    Admit a job for target_user_id, hand it to the bot manager and queue it locally
+    
+    Args:
+        job_type: Bot manager job type, e.g. 'analyze' or 'analyze_not_following_back'
+        target_user_id: Validated Instagram user ID
+        extra_job_data: Optional job-type specific fields passed through to the bot manager
+    
+    Returns:
+        Flask response for the submitting client
+    """
+    # Generate random job ID
+    job_id = generate_job_id()
+    
+    # Create job data
+    job_data = {
+        'job_id': job_id,
+        'target_user_id': target_user_id,
+        'job_type': job_type,
+        'created_at': time.time()
+    }
+    if extra_job_data:
+        job_data.update(extra_job_data)
+    
+    # Check for an existing job and reserve this user in one critical section,
+    # so concurrent requests for the same user cannot both be admitted
+    with state_lock:
+        evict_finished_jobs()
+        if len(job_queue) >= MAX_QUEUED_JOBS or len(job_status) >= MAX_JOBS_IN_MEMORY:
+            return jsonify({'error': 'Server at capacity, retry later'}), 503
+        
+        existing_job_id = find_active_job_for_user(target_user_id)
+        if existing_job_id:
+            existing_job = job_status[existing_job_id]
+            return jsonify({
+                'error': 'Job already exists',
+                'message': f'This user already has a job with status: {existing_job["status"]}',
+                'job_id': existing_job_id,
+                'status': existing_job['status']
+            }), 409
+        
+        job_status[job_id] = {
+            'status': 'queued',
+            'target_user_id': target_user_id,
+            'job_type': job_type,
+            'created_at': job_data['created_at']
+        }
+        user_active_job[target_user_id] = job_id
+    
+    # Submit job to bot manager queue
+    bot_manager_result = submit_job_to_bot_manager(job_data)
+    if not bot_manager_result:
+        # Release the reservation
+        with state_lock:
+            del job_status[job_id]
+            if user_active_job.get(target_user_id) == job_id:
+                del user_active_job[target_user_id]
+        return jsonify({'error': 'Failed to submit job to bot manager'}), 500
+    
+    # Add to local queue
+    with state_lock:
+        job_status[job_id]['position_in_queue'] = bot_manager_result.get('position_in_queue', 1)
+        notify_status_change()
+        job_queue.append(job_data)
+    
+    # Process next job if capacity available
+    process_next_queued_job()
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'position_in_queue': bot_manager_result.get('position_in_queue', 1),
+        'estimated_wait_time': bot_manager_result.get('estimated_wait_time', 0)
+    })
+
 # API Endpoints
 
 @app.route('/api/analyze', methods=['POST'])
@@ -269,20 +565,12 @@ def analyze_followers():
     try:
         data = request.json
         
-        # Validate required fields
-        if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
-        
-        if 'target_user_id' not in data:
-            return jsonify({'error': 'target_user_id is required'}), 400
+        error_response = validate_analysis_request(data)
+        if error_response:
+            return error_response
         
-        target_user_id = data['target_user_id']
         previous_followers = data.get('previous_followers', None)  # Optional
         
-        # Validate target_user_id is numeric
-        if not target_user_id.isdigit():
-            return jsonify({'error': 'target_user_id must be numeric'}), 400
-        
         # Validate previous_followers if provided
         if previous_followers is not None:
             if not isinstance(previous_followers, list):
@@ -290,57 +578,11 @@ def analyze_followers():
             
             if len(previous_followers) == 0:
                 return jsonify({'error': 'previous_followers cannot be empty'}), 400
+            
+            return submit_analysis_job('analyze', data['target_user_id'],
+                                       {'previous_followers': previous_followers})
         
-        # Check if there's already an active job for this user
-        existing_job_id = find_active_job_for_user(target_user_id)
-        if existing_job_id:
-            existing_job = job_status[existing_job_id]
-            return jsonify({
-                'error': 'Job already exists',
-                'message': f'This user already has a job with status: {existing_job["status"]}',
-                'job_id': existing_job_id,
-                'status': existing_job['status']
-            }), 409
-        
-        # Generate random job ID
-        job_id = generate_job_id()
-        
-        # Create job data
-        job_data = {
-            'job_id': job_id,
-            'target_user_id': target_user_id,
-            'job_type': 'analyze',
-            'created_at': time.time()
-        }
-        
-        # Add optional previous_followers if provided
-        if previous_followers is not None:
-            job_data['previous_followers'] = previous_followers
-        
-        # Submit job to bot manager queue
-        bot_manager_result = submit_job_to_bot_manager(job_data)
-        if not bot_manager_result:
-            return jsonify({'error': 'Failed to submit job to bot manager'}), 500
-        
-        # Initialize status in API server
-        job_status[job_id] = {
-            'status': 'queued',
-            'target_user_id': target_user_id,
-            'job_type': 'analyze',
-            'created_at': time.time(),
-            'position_in_queue': bot_manager_result.get('position_in_queue', 1)
-        }
-        
-        # Add to local queue and process next job if capacity available
-        job_queue.append(job_data)
-        process_next_queued_job()
-        
-        return jsonify({
-            'job_id': job_id,
-            'status': 'queued',
-            'position_in_queue': bot_manager_result.get('position_in_queue', 1),
-            'estimated_wait_time': bot_manager_result.get('estimated_wait_time', 0)
-        })
+        return submit_analysis_job('analyze', data['target_user_id'])
         
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
@@ -351,65 +593,11 @@ def analyze_not_following_back():
     try:
         data = request.json
         
-        # Validate required fields
-        if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
-        
-        if 'target_user_id' not in data:
-            return jsonify({'error': 'target_user_id is required'}), 400
+        error_response = validate_analysis_request(data)
+        if error_response:
+            return error_response
         
-        target_user_id = data['target_user_id']
-        
-        # Validate target_user_id is numeric
-        if not target_user_id.isdigit():
-            return jsonify({'error': 'target_user_id must be numeric'}), 400
-        
-        # Check if there's already an active job for this user
-        existing_job_id = find_active_job_for_user(target_user_id)
-        if existing_job_id:
-            existing_job = job_status[existing_job_id]
-            return jsonify({
-                'error': 'Job already exists',
-                'message': f'This user already has a job with status: {existing_job["status"]}',
-                'job_id': existing_job_id,
-                'status': existing_job['status']
-            }), 409
-        
-        # Generate random job ID
-        job_id = generate_job_id()
-        
-        # Create job data
-        job_data = {
-            'job_id': job_id,
-            'target_user_id': target_user_id,
-            'job_type': 'analyze_not_following_back',
-            'created_at': time.time()
-        }
-        
-        # Submit job to bot manager queue
-        bot_manager_result = submit_job_to_bot_manager(job_data)
-        if not bot_manager_result:
-            return jsonify({'error': 'Failed to submit job to bot manager'}), 500
-        
-        # Initialize status in API server
-        job_status[job_id] = {
-            'status': 'queued',
-            'target_user_id': target_user_id,
-            'job_type': 'analyze_not_following_back',
-            'created_at': time.time(),
-            'position_in_queue': bot_manager_result.get('position_in_queue', 1)
-        }
-        
-        # Add to local queue and process next job if capacity available
-        job_queue.append(job_data)
-        process_next_queued_job()
-        
-        return jsonify({
-            'job_id': job_id,
-            'status': 'queued',
-            'position_in_queue': bot_manager_result.get('position_in_queue', 1),
-            'estimated_wait_time': bot_manager_result.get('estimated_wait_time', 0)
-        })
+        return submit_analysis_job('analyze_not_following_back', data['target_user_id'])
         
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
@@ -418,34 +606,55 @@ def analyze_not_following_back():
 def get_status(job_id):
     """Get the status of a job by job_id"""
     
-    if job_id not in job_status:
-        return jsonify({'error': 'Job not found'}), 404
+    with state_lock:
+        if job_id not in job_status:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        queue_positions = get_queue_positions() if job_status[job_id]['status'] == 'queued' else {}
+        status = build_status_response(job_id, queue_positions)
     
-    status = job_status[job_id].copy()
+    return jsonify(status)
+
+@app.route('/api/status/<job_id>/stream', methods=['GET'])
+def stream_status(job_id):
+    """Push status changes of a job as Server-Sent Events instead of having clients poll"""
+    with state_lock:
+        if job_id not in job_status:
+            return jsonify({'error': 'Job not found'}), 404
     
-    # Update queue position if still queued
-    if status['status'] == 'queued':
-        position = 1
-        for job_data in job_queue:
-            if job_data['job_id'] == job_id:
-                status['position_in_queue'] = position
-                break
-            position += 1
+    return Response(generate_status_events(job_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/status', methods=['GET'])
+def get_statuses():
+    """Get the status of several jobs in one request: /api/status?ids=<id1>,<id2>"""
+    job_ids = [job_id for job_id in request.args.get('ids', '').split(',') if job_id]
     
-    # Add timing information
-    if 'started_at' in status:
-        status['processing_time'] = time.time() - status['started_at']
+    if not job_ids:
+        return jsonify({'error': 'ids query parameter is required'}), 400
     
-    return jsonify(status)
+    if len(job_ids) > MAX_STATUS_BATCH:
+        return jsonify({'error': f'At most {MAX_STATUS_BATCH} job ids per request'}), 400
+    
+    with state_lock:
+        # Queue positions are computed once for the whole batch
+        queue_positions = get_queue_positions()
+        statuses = {
+            job_id: build_status_response(job_id, queue_positions) if job_id in job_status
+            else {'error': 'Job not found'}
+            for job_id in job_ids
+        }
+    
+    return jsonify(statuses)
 
 @app.route('/api/queue', methods=['GET'])
 def get_queue_status():
     """Get overall queue status from bot manager"""
     try:
         # Get real status from bot manager
-        response = requests.get(f"{BOT_SLAVE_MANAGER_URL}/api/queue/status", timeout=5)
+        response = get_bot_manager_cached('/api/queue/status')
         if response.status_code == 200:
-            bot_manager_status = response.json()
+            bot_manager_status = orjson.loads(response.content)
             return jsonify({
                 'active_sessions': bot_manager_status.get('active_jobs', 0),
                 'max_concurrent': MAX_CONCURRENT_JOBS,
@@ -479,7 +688,7 @@ def health_check():
     # Check bot slave manager health
     bot_manager_healthy = False
     try:
-        response = requests.get(f"{BOT_SLAVE_MANAGER_URL}/api/bot/health", timeout=5)
+        response = get_bot_manager_cached('/api/bot/health')
         bot_manager_healthy = response.status_code == 200
     except:
         pass
@@ -518,6 +727,8 @@ if __name__ == '__main__':
     print("  POST /api/analyze - Submit new follower analysis job")
     print("  POST /api/analyze-not-following-back - Submit new not-following-back analysis job")
     print("  GET  /api/status/<job_id> - Get job status")
+    print("  GET  /api/status?ids=<id1>,<id2> - Get the status of several jobs")
+    print("  GET  /api/status/<job_id>/stream - Stream job status (Server-Sent Events)")
     print("  GET  /api/queue - Get queue status")
     print("  GET  /api/health - Health check")
     print("=" * 60)
@@ -528,4 +739,4 @@ if __name__ == '__main__':
     print("Starting server on http://localhost:5000")
     print("=" * 60)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(host='0.0.0.0', port=5000, threaded=True, debug=False, use_reloader=False)
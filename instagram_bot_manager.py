@@ -15,17 +15,22 @@ import os
 import json
 import time
 import logging
+import platform
+import signal
+import subprocess
 import threading
 import yaml
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from functools import lru_cache
+from typing import Dict, Optional
 from pathlib import Path
 
 # Suppress Chrome logs at environment level
 os.environ['WDM_LOG_LEVEL'] = '0'  # Suppress webdriver-manager logs
 os.environ['WDM_PRINT_FIRST_LINE'] = 'False'
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -37,6 +42,7 @@ from webdriver_manager.chrome import ChromeDriverManager
 
 # Import Instagram scraper for actual analysis
 from instagram_api_scraper import InstagramAPIScraper
+from json_provider import OrjsonProvider
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -64,6 +70,21 @@ class InstagramBotSlave:
     Individual bot slave that maintains a persistent Instagram session.
     """
     
+    # Known cookie consent buttons as a single XPath union, so a page without the
+    # dialog costs one 5 second wait instead of one per selector
+    COOKIE_CONSENT_XPATH = (
+        "//button[contains(text(), 'Allow all cookies')"  # Instagram specific
+        " or contains(text(), 'Accept')"  # Also covers 'Accept All'
+        " or @data-testid='cookie-accept-all']"
+    )
+    
+    # Media and fonts are never needed to log in or read session cookies; blocking them
+    # keeps idle headless browsers small. Trailing * also matches CDN query strings.
+    BLOCKED_URL_PATTERNS = [
+        "*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.heic*",
+        "*.mp4*", "*.webm*", "*.m4a*", "*.woff*", "*.ttf*"
+    ]
+    
     def __init__(self, bot_id: str, username: str, password: str, config_dir: str = "bot_config"):
         """
         Initialize a bot slave.
@@ -82,6 +103,7 @@ class InstagramBotSlave:
         
         self.driver = None
         self.session_data = {}
+        self.last_login_time = None  # time.monotonic() of the last login/refresh, for is_healthy()
         self.is_logged_in = False
         self.last_activity = None
         self.is_busy = False
@@ -90,10 +112,10 @@ class InstagramBotSlave:
         # Initialize browser
         self._setup_browser()
     
-    def _find_chrome_binary(self):
-        """Find Chrome binary on Windows."""
-        import platform
-        
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _find_chrome_binary():
+        """Find Chrome binary on Windows (searched once per process)."""
         if platform.system() != "Windows":
             return None
             
@@ -112,6 +134,12 @@ class InstagramBotSlave:
         
         logger.error("Chrome not found in common locations")
         return None
+    
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _get_chromedriver_path() -> str:
+        """Download or locate ChromeDriver via webdriver-manager, once per process rather than per browser start."""
+        return ChromeDriverManager().install()
 
     def _setup_browser(self):
         """Setup Chrome browser without persistent user data directory."""
@@ -169,16 +197,28 @@ class InstagramBotSlave:
             # Window size
             chrome_options.add_argument("--window-size=1920,1080")
             
+            # Don't decode images at all
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+            
             # Find Chrome binary
             chrome_binary = self._find_chrome_binary()
             if chrome_binary:
                 chrome_options.binary_location = chrome_binary
             
-            # Use webdriver-manager to automatically handle ChromeDriver
-            service = Service(ChromeDriverManager().install())
+            # Use webdriver-manager to automatically handle ChromeDriver.
+            # On POSIX it gets its own session so cleanup() can kill it together with Chrome.
+            popen_kw = {} if platform.system() == "Windows" else {'start_new_session': True}
+            service = Service(self._get_chromedriver_path(), popen_kw=popen_kw)
             self.driver = webdriver.Chrome(service=service, options=chrome_options)
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
+            # Stop heavy resources from being fetched; a browser that can't do this still works
+            try:
+                self.driver.execute_cdp_cmd("Network.enable", {})
+                self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.BLOCKED_URL_PATTERNS})
+            except Exception as e:
+                logger.warning(f"Bot {self.bot_id}: Could not block media requests: {e}")
+            
             logger.info(f"Bot {self.bot_id}: Browser initialized")
             
         except Exception as e:
@@ -194,27 +234,17 @@ class InstagramBotSlave:
     def _handle_cookie_consent(self):
         """Handle cookie consent dialog if present."""
         try:
-            # Common selectors for cookie consent buttons
-            cookie_selectors = [
-                "//button[contains(text(), 'Allow all cookies')]",  # Instagram specific
-                "//button[contains(text(), 'Accept All')]",
-                "//button[contains(text(), 'Accept')]",
-                "//button[@data-testid='cookie-accept-all']"
-            ]
-            
             wait = WebDriverWait(self.driver, 5)
             
-            for selector in cookie_selectors:
-                try:
-                    cookie_button = wait.until(EC.element_to_be_clickable((By.XPATH, selector)))
-                    cookie_button.click()
-                    logger.info(f"Bot {self.bot_id}: Clicked cookie consent button")
-                    time.sleep(3)
-                    return
-                except TimeoutException:
-                    continue
+            try:
+                cookie_button = wait.until(EC.element_to_be_clickable((By.XPATH, self.COOKIE_CONSENT_XPATH)))
+            except TimeoutException:
+                logger.info(f"Bot {self.bot_id}: No cookie consent dialog found")
+                return
             
-            logger.info(f"Bot {self.bot_id}: No cookie consent dialog found")
+            cookie_button.click()
+            logger.info(f"Bot {self.bot_id}: Clicked cookie consent button")
+            time.sleep(3)
             
         except Exception as e:
             logger.warning(f"Bot {self.bot_id}: Error handling cookie consent: {e}")
@@ -258,9 +288,9 @@ class InstagramBotSlave:
             
             try:
                 # Extract session data
-                cookies = self.driver.get_cookies()
-                csrf_token = self._extract_csrf_token(cookies)
-                session_id = self._extract_session_id(cookies)
+                cookies = {cookie['name']: cookie['value'] for cookie in self.driver.get_cookies()}
+                csrf_token = cookies.get('csrftoken')
+                session_id = cookies.get('sessionid')
                 user_id = self._extract_user_id_from_session(session_id)
                 
                 logger.info(f"Bot {self.bot_id}: Extracted session data - CSRF: {csrf_token is not None}, SessionID: {session_id is not None}, UserID: {user_id is not None}")
@@ -277,6 +307,7 @@ class InstagramBotSlave:
                     'user_id': user_id,
                     'last_login': datetime.now().isoformat()
                 }
+                self.last_login_time = time.monotonic()
                 
                 self.is_logged_in = True
                 self.last_activity = datetime.now()
@@ -306,9 +337,9 @@ class InstagramBotSlave:
             # Check if current session is still valid
             if self._is_session_valid():
                 # Update session data with current cookies
-                cookies = self.driver.get_cookies()
-                csrf_token = self._extract_csrf_token(cookies)
-                session_id = self._extract_session_id(cookies)
+                cookies = {cookie['name']: cookie['value'] for cookie in self.driver.get_cookies()}
+                csrf_token = cookies.get('csrftoken')
+                session_id = cookies.get('sessionid')
                 user_id = self._extract_user_id_from_session(session_id)
                 
                 self.session_data = {
@@ -317,6 +348,7 @@ class InstagramBotSlave:
                     'user_id': user_id,
                     'last_login': datetime.now().isoformat()
                 }
+                self.last_login_time = time.monotonic()
                 
                 self.is_logged_in = True
                 self.last_activity = datetime.now()
@@ -393,10 +425,8 @@ class InstagramBotSlave:
             return False
         
         # Check if session is not too old (24 hours)
-        if self.session_data.get('last_login'):
-            last_login = datetime.fromisoformat(self.session_data['last_login'])
-            if datetime.now() - last_login > timedelta(hours=24):
-                return False
+        if self.last_login_time is not None and time.monotonic() - self.last_login_time > 24 * 3600:
+            return False
         
         return True
     
@@ -425,25 +455,13 @@ class InstagramBotSlave:
             logger.error(f"Bot {self.bot_id}: Error checking session validity: {e}")
             return False
     
-    def _extract_csrf_token(self, cookies: List[Dict]) -> Optional[str]:
-        """Extract CSRF token from cookies."""
-        for cookie in cookies:
-            if cookie['name'] == 'csrftoken':
-                return cookie['value']
-        return None
-    
-    def _extract_session_id(self, cookies: List[Dict]) -> Optional[str]:
-        """Extract session ID from cookies."""
-        for cookie in cookies:
-            if cookie['name'] == 'sessionid':
-                return cookie['value']
-        return None
-    
     def _extract_user_id_from_session(self, session_id: str) -> Optional[str]:
         """Extract user ID from session ID."""
         try:
-            if session_id and '%' in session_id:
-                return session_id.split('%')[0]
+            if session_id:
+                user_id, separator, _ = session_id.partition('%')
+                if separator:
+                    return user_id
         except:
             pass
         return None
@@ -460,7 +478,11 @@ class InstagramBotSlave:
             raise
     
     def restart(self) -> bool:
-        """Restart the bot by closing current session and creating a new one."""
+        """
+        Restart the bot by closing current session and creating a new one.
+        
+        is_busy is left as is: a caller that claimed the bot releases it once the restart is done.
+        """
         try:
             logger.info(f"Bot {self.bot_id}: Restarting bot...")
             
@@ -470,8 +492,8 @@ class InstagramBotSlave:
             # Reset state
             self.is_logged_in = False
             self.session_data = {}
+            self.last_login_time = None
             self.last_activity = None
-            self.is_busy = False
             
             # Setup new browser
             self._setup_browser()
@@ -488,10 +510,49 @@ class InstagramBotSlave:
             logger.error(f"Bot {self.bot_id}: Restart error: {e}")
             return False
     
+    def _kill_browser_processes(self, service_process):
+        """
+        Force-kill chromedriver and the Chrome processes it started.
+        
+        On Windows this must run before driver.quit(): taskkill finds the tree through
+        chromedriver's PID, and quit() ends chromedriver while leaving chrome.exe behind.
+        On POSIX it runs after quit(), killing chromedriver's whole process group.
+        """
+        if service_process is None:
+            return
+        
+        try:
+            if platform.system() == "Windows":
+                if service_process.poll() is None:
+                    subprocess.run(["taskkill", "/F", "/T", "/PID", str(service_process.pid)],
+                                   capture_output=True)
+                    logger.info(f"Bot {self.bot_id}: Killed browser process tree")
+            else:
+                # chromedriver leads its own process group (see _setup_browser)
+                os.killpg(service_process.pid, signal.SIGKILL)
+                logger.info(f"Bot {self.bot_id}: Killed leftover browser processes")
+        except ProcessLookupError:
+            pass  # quit() already took everything down
+        except Exception as e:
+            logger.warning(f"Bot {self.bot_id}: Failed to kill browser processes: {e}")
+    
     def cleanup(self):
         """Cleanup resources."""
         if self.driver:
-            self.driver.quit()
+            # quit() is known to leave chromedriver/Chrome processes running, so keep
+            # a handle on the service process and make sure its tree is gone
+            service_process = getattr(self.driver.service, 'process', None)
+            is_windows = platform.system() == "Windows"
+            if is_windows:
+                self._kill_browser_processes(service_process)
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.warning(f"Bot {self.bot_id}: Error quitting browser: {e}")
+            finally:
+                self.driver = None
+            if not is_windows:
+                self._kill_browser_processes(service_process)
         
         # Cleanup scraper if it exists
         if self.scraper:
@@ -525,8 +586,10 @@ class InstagramBotSlaveManager:
         # Hardcoded settings - no configuration needed
         self.port = 5001
         self.health_check_interval = 1800  # 30 minutes
+        self.status_stream_heartbeat = 15  # seconds between keep-alive comments on status streams
         
         self.bot_slaves = {}
+        self.bot_pool_lock = threading.Lock()  # Guards claiming a bot (setting is_busy) and adding/removing bots
         self.monitoring_thread = None
         self.is_monitoring = False
         
@@ -537,8 +600,13 @@ class InstagramBotSlaveManager:
         self.job_processing_thread = None
         self.is_processing_jobs = False
         
+        # Status stream subscribers wait on this; job_state_version bumps on every transition
+        self.job_state_condition = threading.Condition()
+        self.job_state_version = 0
+        
         # Flask app for HTTP API
         self.app = Flask(__name__)
+        self.app.json = OrjsonProvider(self.app)
         self._setup_routes()
         
         # Load and initialize bot slaves from configuration
@@ -608,12 +676,14 @@ class InstagramBotSlaveManager:
                 
                 # Attempt login
                 if bot_slave.login():
-                    self.bot_slaves[bot_id] = bot_slave
+                    with self.bot_pool_lock:
+                        self.bot_slaves[bot_id] = bot_slave
                     logger.info(f"✅ Bot {bot_id} added and logged in successfully")
                 else:
                     logger.warning(f"⚠️ Initial login failed for bot {bot_id}, attempting restart...")
                     if bot_slave.restart():
-                        self.bot_slaves[bot_id] = bot_slave
+                        with self.bot_pool_lock:
+                            self.bot_slaves[bot_id] = bot_slave
                         logger.info(f"✅ Bot {bot_id} restarted and logged in successfully")
                     else:
                         logger.error(f"❌ Failed to login bot {bot_id} even after restart")
@@ -641,14 +711,16 @@ class InstagramBotSlaveManager:
             
             # Attempt login
             if bot_slave.login():
-                self.bot_slaves[bot_id] = bot_slave
+                with self.bot_pool_lock:
+                    self.bot_slaves[bot_id] = bot_slave
                 self._save_bot_configurations()
                 logger.info(f"Bot slave {bot_id} added and logged in successfully")
                 return True
             else:
                 logger.warning(f"Initial login failed for bot slave {bot_id}, attempting restart...")
                 if bot_slave.restart():
-                    self.bot_slaves[bot_id] = bot_slave
+                    with self.bot_pool_lock:
+                        self.bot_slaves[bot_id] = bot_slave
                     self._save_bot_configurations()
                     logger.info(f"Bot slave {bot_id} restarted and logged in successfully")
                     return True
@@ -668,22 +740,33 @@ class InstagramBotSlaveManager:
             Dict with session data or None if no bots available
         """
         # Find a healthy, non-busy bot
-        for bot_id, bot_slave in self.bot_slaves.items():
-            if not bot_slave.is_busy and bot_slave.is_healthy():
-                bot_slave.is_busy = True
-                bot_slave.last_activity = datetime.now()
-                return bot_slave.get_session_data()
-        
-        # If no healthy bots, try to refresh one
-        for bot_id, bot_slave in self.bot_slaves.items():
-            if not bot_slave.is_busy:
-                logger.info(f"Attempting to refresh bot {bot_id}")
-                if bot_slave.refresh_session():
+        with self.bot_pool_lock:
+            for bot_id, bot_slave in self.bot_slaves.items():
+                if not bot_slave.is_busy and bot_slave.is_healthy():
                     bot_slave.is_busy = True
                     bot_slave.last_activity = datetime.now()
                     return bot_slave.get_session_data()
         
-        return None
+        # If no healthy bots, try to refresh one. Each candidate is claimed before the
+        # slow Selenium refresh, so concurrent callers never refresh the same bot twice.
+        tried = set()
+        while True:
+            with self.bot_pool_lock:
+                bot_id, bot_slave = next(
+                    ((bot_id, bot_slave) for bot_id, bot_slave in self.bot_slaves.items()
+                     if not bot_slave.is_busy and bot_id not in tried),
+                    (None, None)
+                )
+                if bot_slave is None:
+                    return None
+                bot_slave.is_busy = True
+            
+            tried.add(bot_id)
+            logger.info(f"Attempting to refresh bot {bot_id}")
+            if bot_slave.refresh_session():
+                bot_slave.last_activity = datetime.now()
+                return bot_slave.get_session_data()
+            bot_slave.is_busy = False
     
     def submit_job(self, job_data: dict) -> dict:
         """
@@ -702,6 +785,7 @@ class InstagramBotSlaveManager:
         
         # Add to queue
         self.job_queue.append(job_data)
+        self._notify_job_state_change()
         
         logger.info(f"Job {job_id} submitted to queue (position: {len(self.job_queue)})")
         
@@ -786,6 +870,7 @@ class InstagramBotSlaveManager:
                         job_data['status'] = 'processing'
                         job_data['assigned_bot'] = bot_data['bot_id']
                         job_data['started_at'] = datetime.now().isoformat()
+                        self._notify_job_state_change()
                         
                         # Start processing the job with the assigned bot
                         logger.info(f"Job {job_id} assigned to bot {bot_data['bot_id']}")
@@ -859,6 +944,47 @@ class InstagramBotSlaveManager:
             # Remove from active jobs
             if job_id in self.active_jobs:
                 del self.active_jobs[job_id]
+            
+            self._notify_job_state_change()
+    
+    def _notify_job_state_change(self):
+        """Wake up status stream subscribers after a job changes state."""
+        with self.job_state_condition:
+            self.job_state_version += 1
+            self.job_state_condition.notify_all()
+    
+    def _stream_job_status(self, job_id: str):
+        """
+        Yield Server-Sent Events frames for a job until it reaches a terminal state.
+        
+        A frame is sent whenever the job's status or queue position changes, and a
+        keep-alive comment is sent when nothing happened for status_stream_heartbeat seconds.
+        """
+        last_key = None
+        while True:
+            with self.job_state_condition:
+                seen_version = self.job_state_version
+            
+            status = self.get_job_status(job_id) or {
+                'job_id': job_id,
+                'status': 'not_found',
+                'message': 'Job not found in queue or completed jobs'
+            }
+            key = (status['status'], status.get('position_in_queue'))
+            if key != last_key:
+                last_key = key
+                yield f"data: {self.app.json.dumps(status)}\n\n"
+            
+            if status['status'] in ('completed', 'failed', 'not_found'):
+                return
+            
+            with self.job_state_condition:
+                changed = self.job_state_condition.wait_for(
+                    lambda: self.job_state_version != seen_version,
+                    timeout=self.status_stream_heartbeat
+                )
+            if not changed:
+                yield ": keepalive\n\n"
     
     def _analyze_followers(self, bot_slave, target_user_id: str, previous_followers: list = None) -> dict:
         """Analyze followers using the bot slave."""
@@ -869,8 +995,7 @@ class InstagramBotSlaveManager:
             scraper = bot_slave.get_scraper(target_user_id)
             
             # Fetch data using bot account
-            followers = scraper.extract_usernames(scraper.get_followers())
-            following = scraper.extract_usernames(scraper.get_following())
+            followers, following = self._fetch_followers_and_following(scraper)
 
             # Get bot data for result
             bot_data = bot_slave.get_session_data()
@@ -888,10 +1013,9 @@ class InstagramBotSlaveManager:
             }
             
             # Compare with previous followers to find unfollowers
-            if previous_followers:                
-                previous_set = set(previous_followers)
-                current_set = set(followers)
-                unfollowers = list(current_set - previous_set)
+            if previous_followers:
+                # One hash table; previous_followers is consumed straight from the request list
+                unfollowers = list(set(followers).difference(previous_followers))
                 result['unfollowers'] = unfollowers
             
             logger.info(f"Follower analysis completed.")
@@ -912,12 +1036,9 @@ class InstagramBotSlaveManager:
             # Get bot data for result
             bot_data = bot_slave.get_session_data()
             
-            # Fetch current followers
-            followers = scraper.get_followers()
-            following = scraper.get_following()
-            not_following_back = self._find_non_follow_backs(
-                scraper.extract_usernames(followers), 
-                scraper.extract_usernames(following))
+            # Fetch current followers and following
+            followers, following = self._fetch_followers_and_following(scraper)
+            not_following_back = self._find_non_follow_backs(followers, following)
             
             # Format result
             result = {
@@ -937,12 +1058,25 @@ class InstagramBotSlaveManager:
             logger.error(f"Error analyzing users who don't follow back: {e}")
             raise
     
+    def _fetch_followers_and_following(self, scraper: InstagramAPIScraper) -> tuple:
+        """Fetch followers and following concurrently, as the two paginations are independent."""
+        with ThreadPoolExecutor(max_workers=2) as fetch_executor:
+            followers_future = fetch_executor.submit(scraper.get_followers)
+            following_future = fetch_executor.submit(scraper.get_following)
+            return followers_future.result(), following_future.result()
+    
     def _find_non_follow_backs(self, followers: list, following: list) -> list:
         """Find users who don't follow back"""
-        follower_set = set(followers)
-        following_set = set(following)
-        not_following_back = list(following_set - follower_set)
-        
+        # dict.fromkeys drops usernames repeated across overlapping pages while keeping
+        # Instagram's order; the followers side is only hashed when it is the smaller one
+        if len(following) < len(followers):
+            unique_following = dict.fromkeys(following)
+            followed_back = unique_following.keys() & followers
+            not_following_back = [username for username in unique_following if username not in followed_back]
+        else:
+            follower_set = set(followers)
+            not_following_back = list(dict.fromkeys(username for username in following if username not in follower_set))
+
         return not_following_back
     
     def get_job_status(self, job_id: str) -> Optional[dict]:
@@ -1042,16 +1176,25 @@ class InstagramBotSlaveManager:
         while self.is_monitoring:
             try:
                 # Create a copy of items to avoid modifying dict during iteration
-                bots_to_check = list(self.bot_slaves.items())
+                with self.bot_pool_lock:
+                    bots_to_check = list(self.bot_slaves.items())
                 for bot_id, bot_slave in bots_to_check:
-                    if not bot_slave.is_healthy() and not bot_slave.is_busy:
+                    # Claim the bot so get_available_bot() can't hand it out or refresh it meanwhile
+                    with self.bot_pool_lock:
+                        if bot_slave.is_busy or bot_slave.is_healthy():
+                            continue
+                        bot_slave.is_busy = True
+                    
+                    try:
                         logger.warning(f"Bot {bot_id} unhealthy, attempting refresh")
                         if not bot_slave.refresh_session():
                             logger.warning(f"Bot {bot_id} refresh failed, attempting restart")
                             if not bot_slave.restart():
                                 logger.error(f"Bot {bot_id} restart failed, removing from pool")
-                                if bot_id in self.bot_slaves:
-                                    del self.bot_slaves[bot_id]
+                                with self.bot_pool_lock:
+                                    self.bot_slaves.pop(bot_id, None)
+                    finally:
+                        bot_slave.is_busy = False
                 
                 time.sleep(check_interval)
                 
@@ -1113,6 +1256,15 @@ class InstagramBotSlaveManager:
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
         
+        @self.app.route('/api/job/status/<job_id>/subscribe', methods=['GET'])
+        def subscribe_job_status(job_id):
+            """Stream status changes of a job as Server-Sent Events until it finishes."""
+            return Response(
+                self._stream_job_status(job_id),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
         @self.app.route('/api/job/complete', methods=['POST'])
         def complete_job():
             """Mark a job as completed."""